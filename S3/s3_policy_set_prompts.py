@@ -1,23 +1,65 @@
 import boto3
-import csv
 import logging
+import mmap
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from functools import lru_cache
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 # Common Variables
 LOG_FILE_NAME = f"s3_lifecycle_policy_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+CSV_READ_BUFFER_SIZE = 1024 * 1024  # Read the bucket CSV in 1 MiB chunks
+CSV_MMAP_THRESHOLD = 64 * 1024 * 1024  # Memory-map bucket CSVs larger than 64 MiB instead of reading them as text
+MAX_WORKERS = 32  # Number of buckets processed concurrently
+# Client settings: reuse TCP connections, pool enough of them for MAX_WORKERS and back off on throttling
+CLIENT_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    parameter_validation=False,  # Requests are built by this script, so skip botocore's per-call validation
+)
+BUCKET_ACCESS_ERROR_CODES = ('NoSuchBucket', 'AccessDenied', '404')  # Errors meaning the bucket is missing or inaccessible
 AWS_PROFILES = ['account_id']  # List of AWS CLI profiles you want to use
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[ 
-        logging.StreamHandler(),  # Print logs to console
-        logging.FileHandler(LOG_FILE_NAME)  # Save logs to file
-    ]
-)
+class CachedTimeFormatter(logging.Formatter):
+    """Log formatter that formats the timestamp once per second instead of once per record."""
+    cached_time = None  # (second, formatted timestamp) of the last record
+
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        cached_time = self.cached_time
+        if cached_time is None or cached_time[0] != second:
+            cached_time = (second, time.strftime(datefmt or self.default_time_format, self.converter(record.created)))
+            self.cached_time = cached_time
+        if datefmt:
+            return cached_time[1]
+        return self.default_msec_format % (cached_time[1], record.msecs)
+
+# Set up logging, sharing one formatter between the handlers so they also share its cached timestamp
+log_formatter = CachedTimeFormatter('%(asctime)s - %(levelname)s - %(message)s')
+log_handlers = [
+    logging.StreamHandler(),  # Print logs to console
+    logging.FileHandler(LOG_FILE_NAME)  # Save logs to file
+]
+for log_handler in log_handlers:
+    log_handler.setFormatter(log_formatter)
+logging.basicConfig(level=logging.INFO, handlers=log_handlers)
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def get_session(profile):
+    """Return the boto3 session for the profile, creating it on first use."""
+    return boto3.Session(profile_name=profile)
+
+@lru_cache(maxsize=None)
+def get_client(profile, service, region=None):
+    """Return the client for the profile, service and region, creating it on first use."""
+    return get_session(profile).client(service, region_name=region, config=CLIENT_CONFIG)
 
 def get_lifecycle_input():
     """Prompt user for lifecycle configuration days and storage class."""
@@ -35,100 +77,157 @@ def get_lifecycle_input():
 
     return int(transition_days), storage_class
 
-def create_lifecycle_policy(bucket_name, s3_client, profile, transition_days, storage_class):
+def build_lifecycle_rule(transition_days, storage_class):
+    """Build the lifecycle rule shared by every bucket; only the rule ID is filled in per bucket."""
+    return {
+        'Filter': {},  # Empty filter applies to all objects in the bucket
+        'Status': 'Enabled',
+        'Transitions': [
+            {
+                'Days': transition_days,
+                'StorageClass': storage_class
+            }
+        ],
+        'Expiration': {
+            'Days': transition_days + 365  # Set expiration to one year after transition
+        },
+        'NoncurrentVersionTransitions': [
+            {
+                'NoncurrentDays': transition_days,
+                'StorageClass': storage_class
+            }
+        ],
+        'NoncurrentVersionExpiration': {
+            'NoncurrentDays': transition_days + 365  # Expire non-current versions after one year
+        }
+    }
+
+def normalize_lifecycle_value(value):
+    """Drop empty strings, dicts and lists at every level of a lifecycle configuration value.
+
+    S3 does not return rules in exactly the shape they were sent (an empty Filter may come back as
+    {'Prefix': ''}), so both sides are normalized before comparing.
+    """
+    if isinstance(value, dict):
+        value = {key: normalize_lifecycle_value(item) for key, item in value.items()}
+        return {key: item for key, item in value.items() if item not in ('', {}, [], None)}
+    if isinstance(value, list):
+        return [normalize_lifecycle_value(item) for item in value]
+    return value
+
+def lifecycle_policy_is_current(bucket_name, s3_client, lifecycle_config):
+    """Return True if the bucket's lifecycle rules already match the given configuration."""
+    try:
+        current_config = s3_client.get_bucket_lifecycle_configuration(Bucket=bucket_name)
+    except ClientError as e:
+        # No policy yet, or no permission to read it: fall through to the put, which reports its own errors
+        if e.response['Error']['Code'] in ('NoSuchLifecycleConfiguration', 'AccessDenied'):
+            return False
+        raise
+    return normalize_lifecycle_value(current_config.get('Rules', [])) == normalize_lifecycle_value(lifecycle_config['Rules'])
+
+def create_lifecycle_policy(bucket_name, s3_client, profile, lifecycle_rule):
     """Create the S3 lifecycle policy to transition objects to the chosen storage class and then expire them."""
     lifecycle_policy_name = f'{bucket_name}_lifecycle_policy'
 
     try:
         lifecycle_config = {
-            'Rules': [
-                {
-                    'ID': lifecycle_policy_name,
-                    'Filter': {},  # Empty filter applies to all objects in the bucket
-                    'Status': 'Enabled',
-                    'Transitions': [
-                        {
-                            'Days': transition_days,
-                            'StorageClass': storage_class
-                        }
-                    ],
-                    'Expiration': {
-                        'Days': transition_days + 365  # Set expiration to one year after transition
-                    },
-                    'NoncurrentVersionTransitions': [
-                        {
-                            'NoncurrentDays': transition_days,
-                            'StorageClass': storage_class
-                        }
-                    ],
-                    'NoncurrentVersionExpiration': {
-                        'NoncurrentDays': transition_days + 365  # Expire non-current versions after one year
-                    }
-                }
-            ]
+            'Rules': [{'ID': lifecycle_policy_name, **lifecycle_rule}]
         }
 
+        # Skip buckets that already carry exactly this policy
+        if lifecycle_policy_is_current(bucket_name, s3_client, lifecycle_config):
+            logger.info("Profile %s - Lifecycle policy already up to date for bucket: %s. Skipping.", profile, bucket_name)
+            return
+
         # Apply the lifecycle configuration to the bucket
         s3_client.put_bucket_lifecycle_configuration(
             Bucket=bucket_name,
             LifecycleConfiguration=lifecycle_config
         )
-        logging.info(f"Profile {profile} - Lifecycle policy created successfully for bucket: {bucket_name}")
+        logger.info("Profile %s - Lifecycle policy created successfully for bucket: %s", profile, bucket_name)
 
     except ClientError as e:
-        logging.error(f"Profile {profile} - Error creating lifecycle policy for bucket {bucket_name}: {e}")
+        if e.response['Error']['Code'] in BUCKET_ACCESS_ERROR_CODES:
+            # Raise an exception if the bucket is incorrect or inaccessible
+            logger.error("Profile %s - Bucket %s does not exist or cannot be accessed: %s", profile, bucket_name, e)
+            raise Exception(f"Bucket {bucket_name} is not accessible or doesn't exist.")
+        logger.error("Profile %s - Error creating lifecycle policy for bucket %s: %s", profile, bucket_name, e)
         raise
 
+def iter_bucket_names(csv_file_path):
+    """Yield the first column of every line in the CSV file, memory-mapping very large files.
+
+    Surrounding double quotes are stripped, as csv.reader would for a quoted field.
+    """
+    if os.path.getsize(csv_file_path) > CSV_MMAP_THRESHOLD:
+        # Let the kernel page the file in on demand and only decode the bucket name itself
+        with open(csv_file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for line in iter(mapped.readline, b''):
+                yield line.split(b',', 1)[0].strip().strip(b'"').decode('utf-8')
+    else:
+        with open(csv_file_path, 'r', buffering=CSV_READ_BUFFER_SIZE) as file:
+            for line in file:
+                yield line.split(',', 1)[0].strip().strip('"')
+
+def read_bucket_names(csv_file_path):
+    """Read the unique bucket names from the first column of the CSV file, skipping blank lines."""
+    # dict.fromkeys drops repeated names while keeping the order they appear in
+    return list(dict.fromkeys(name for name in iter_bucket_names(csv_file_path) if name))
+
 def process_buckets(csv_file_path, transition_days, storage_class):
     """Process the CSV file with bucket names and apply lifecycle policies."""
     try:
-        with open(csv_file_path, 'r') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                bucket_name = row[0].strip()
-                if not bucket_name:
-                    continue
-
-                logging.info(f"Processing bucket: {bucket_name}")
-                for profile in AWS_PROFILES:
-                    session = boto3.Session(profile_name=profile)
-                    s3_client = session.client('s3')
-
-                    # Log the profile/account being used
-                    logging.info(f"Profile {profile} - Using AWS Profile")
-
-                    # Check if the bucket exists
-                    try:
-                        s3_client.head_bucket(Bucket=bucket_name)
-                        # If the bucket exists, create the lifecycle policy
-                        create_lifecycle_policy(bucket_name, s3_client, profile, transition_days, storage_class)
-                    except ClientError as e:
-                        logging.error(f"Profile {profile} - Bucket {bucket_name} does not exist or cannot be accessed: {e}")
-                        raise Exception(f"Bucket {bucket_name} is not accessible or doesn't exist.")
+        bucket_names = read_bucket_names(csv_file_path)
+        lifecycle_rule = build_lifecycle_rule(transition_days, storage_class)
+
+        # One client per profile, built up front and shared by the worker threads (boto3 clients are thread-safe)
+        profile_clients = []
+        for profile in AWS_PROFILES:
+            # Log the profile/account being used
+            logger.info("Profile %s - Using AWS Profile", profile)
+            profile_clients.append((profile, get_client(profile, 's3')))
+
+        # The S3 calls are network-bound, so apply the policies for every profile and bucket concurrently
+        tasks = [
+            (bucket_name, s3_client, profile)
+            for profile, s3_client in profile_clients
+            for bucket_name in bucket_names
+        ]
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [executor.submit(create_lifecycle_policy, *task, lifecycle_rule) for task in tasks]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except Exception:
+                # Stop at the first failing bucket like the serial loop did: buckets already in flight
+                # finish, the ones not yet started are cancelled
+                executor.shutdown(cancel_futures=True)
+                raise
     except FileNotFoundError:
-        logging.error(f"CSV file not found: {csv_file_path}")
+        logger.error("CSV file not found: %s", csv_file_path)
         raise
     except Exception as e:
-        logging.error(f"Unexpected error while processing buckets: {e}")
+        logger.error("Unexpected error while processing buckets: %s", e)
         raise
 
 def main():
     """Main function to run the lifecycle policy creation."""
     if len(sys.argv) < 2:
-        logging.error("Usage: python create_s3_lifecycle_policy.py <path_to_csv>")
+        logger.error("Usage: python create_s3_lifecycle_policy.py <path_to_csv>")
         sys.exit(1)
     
     csv_file_path = sys.argv[1]
-    logging.info("Starting the lifecycle policy creation process...")
+    logger.info("Starting the lifecycle policy creation process...")
 
     # Get the user input for lifecycle days and storage class
     transition_days, storage_class = get_lifecycle_input()
     
     try:
         process_buckets(csv_file_path, transition_days, storage_class)
-        logging.info("Lifecycle policy creation process completed.")
+        logger.info("Lifecycle policy creation process completed.")
     except Exception as e:
-        logging.error(f"Process terminated due to error: {e}")
+        logger.error("Process terminated due to error: %s", e)
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,6 +1,12 @@
 import boto3
+from botocore.config import Config
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 import traceback
 
 # List of AWS regions
@@ -9,40 +15,129 @@ regions = ['us-east-1', 'us-west-1', 'us-west-2', 'us-east-2']  # Example region
 # Retention period in days (e.g., 30 or 60)
 RETENTION_DAYS = 30
 
+# Number of put_retention_policy calls in flight per region. PutRetentionPolicy is limited to 5 requests
+# per second per account and region, and a call takes roughly 200-400 ms, so two concurrent calls already
+# reach the quota; more workers only get throttled, and each throttle uses up one of the retry attempts
+MAX_WORKERS = 2
+# Maximum number of listed log group names waiting to be updated within a region
+QUEUE_SIZE = 512
+
+# Client settings: reuse TCP connections between calls, pool one per worker plus one for the listing,
+# and back off on throttling
+CLIENT_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=MAX_WORKERS + 1,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    parameter_validation=False,  # Requests are built by this script, so skip botocore's per-call validation
+)
+
 # List of AWS CLI profiles to use (representing different AWS accounts)
 aws_profiles = ['accountid']  # Replace with your AWS CLI profile names
 
-# Function to get the AWS Account ID
+# boto3 sessions aren't thread-safe, so clients are created one at a time
+client_lock = threading.Lock()
+
+# Function to get the boto3 session for a profile, created once and reused
+@lru_cache(maxsize=None)
+def get_session(profile):
+    return boto3.Session(profile_name=profile)
+
+# Function to get the client for a profile, service and region, created once and reused
+@lru_cache(maxsize=None)
+def get_client(profile, service, region=None):
+    with client_lock:
+        return get_session(profile).client(service, region_name=region, config=CLIENT_CONFIG)
+
+# Function to get the AWS Account ID, looked up once per profile. Nothing in this script calls it
+# today; the cache only avoids repeat STS calls if a caller is added
+@lru_cache(maxsize=None)
 def get_account_id(profile):
-    sts_client = boto3.Session(profile_name=profile).client('sts')
+    sts_client = get_client(profile, 'sts')
     response = sts_client.get_caller_identity()
     return response['Account']
 
-# Function to set the retention policy for *all* log groups in an AWS region
+# Function to set the retention policy of a single log group to RETENTION_DAYS
+def put_retention_policy(logs_client, log_group_name, profile, logger):
+    # Only called for groups not already at RETENTION_DAYS (enqueue_log_groups skips those); update them
+    logger.info(
+        "Profile %s - Setting retention for log group '%s' to %s days.",
+        profile, log_group_name, RETENTION_DAYS
+    )
+    logs_client.put_retention_policy(
+        logGroupName=log_group_name,
+        retentionInDays=RETENTION_DAYS
+    )
+
+# Function to update log groups taken from the queue until a None sentinel arrives
+def put_retention_worker(logs_client, work_queue, profile, logger, errors):
+    while True:
+        log_group_name = work_queue.get()
+        if log_group_name is None:
+            return
+        # After a failure keep draining the queue so the listing never blocks, but stop updating
+        if errors:
+            continue
+        try:
+            put_retention_policy(logs_client, log_group_name, profile, logger)
+        except Exception as e:
+            errors.append(e)
+
+# Function to queue the log groups to update, listing the region one page at a time
+def enqueue_log_groups(logs_client, work_queue, profile, logger, errors):
+    paginator = logs_client.get_paginator('describe_log_groups')
+    for page in paginator.paginate(PaginationConfig={'PageSize': 50}):
+        # Stop listing once an update has failed
+        if errors:
+            break
+        for log_group in page['logGroups']:
+            if log_group.get('retentionInDays') == RETENTION_DAYS:
+                continue
+            work_queue.put(log_group['logGroupName'])
+
+# Function to set the retention policy for *all* log groups in an AWS region not already at RETENTION_DAYS
 def set_retention_for_log_groups(region, profile, logger):
     try:
-        # Initialize the session for the region using the specified profile
-        session = boto3.Session(profile_name=profile)
-        logs_client = session.client('logs', region_name=region)
-
-        # List all log groups
-        paginator = logs_client.get_paginator('describe_log_groups')
-        for page in paginator.paginate():
-            for log_group in page['logGroups']:
-                log_group_name = log_group['logGroupName']
-                # Regardless of the current retention setting, update it to RETENTION_DAYS
-                logger.info(
-                    f"Profile {profile} - Setting retention for log group '{log_group_name}' to {RETENTION_DAYS} days."
-                )
-                logs_client.put_retention_policy(
-                    logGroupName=log_group_name,
-                    retentionInDays=RETENTION_DAYS
-                )
+        logger.info("Processing log groups in region %s...", region)
+
+        # Get the client for the region using the specified profile
+        logs_client = get_client(profile, 'logs', region)
+
+        # Describe and update as a pipeline: the listing feeds names into a bounded queue while
+        # MAX_WORKERS threads drain it, so fetching the next page overlaps the put calls
+        work_queue = queue.Queue(maxsize=QUEUE_SIZE)
+        errors = []
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for _ in range(MAX_WORKERS):
+                executor.submit(put_retention_worker, logs_client, work_queue, profile, logger, errors)
+            try:
+                # List all log groups, leaving out the ones already set to RETENTION_DAYS
+                enqueue_log_groups(logs_client, work_queue, profile, logger, errors)
+            finally:
+                # One sentinel per worker signals that the listing is done
+                for _ in range(MAX_WORKERS):
+                    work_queue.put(None)
+
+        if errors:
+            raise errors[0]
     except Exception as e:
-        logger.error(f"Error processing log groups in region {region} with profile {profile}: {e}")
-        logger.error("Traceback: " + traceback.format_exc())  # Log the full traceback
+        logger.error("Error processing log groups in region %s with profile %s: %s", region, profile, e)
+        logger.error("Traceback: %s", traceback.format_exc())  # Log the full traceback
         raise  # Reraise the exception after logging it
 
+# Log formatter that formats the timestamp once per second instead of once per record
+class CachedTimeFormatter(logging.Formatter):
+    cached_time = None  # (second, formatted timestamp) of the last record
+
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        cached_time = self.cached_time
+        if cached_time is None or cached_time[0] != second:
+            cached_time = (second, time.strftime(datefmt or self.default_time_format, self.converter(record.created)))
+            self.cached_time = cached_time
+        if datefmt:
+            return cached_time[1]
+        return self.default_msec_format % (cached_time[1], record.msecs)
+
 # Set up logging with a timestamped log file name
 def setup_logging(profile_name):
     # Get the current timestamp and format it as YYYY-MM-DD_HH-MM-SS
@@ -51,18 +146,26 @@ def setup_logging(profile_name):
     log_file_name = f"{profile_name}_{timestamp}_outputlogfile.log"
 
     # Set up logging with both file and terminal output
-    logger = logging.getLogger()
+    logger = logging.getLogger(__name__)
     logger.setLevel(logging.INFO)
 
+    # Drop the handlers added for the previous profile so records aren't written more than once
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    # Both handlers share one formatter, and with it the cached timestamp
+    log_formatter = CachedTimeFormatter('%(asctime)s - %(levelname)s - %(message)s')
+
     # Create file handler to log to a file
     file_handler = logging.FileHandler(log_file_name)
     file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    file_handler.setFormatter(log_formatter)
 
     # Create console (stream) handler to log to the terminal
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    console_handler.setFormatter(log_formatter)
 
     # Add both handlers to the logger
     logger.addHandler(file_handler)
@@ -76,18 +179,21 @@ def process_log_groups():
         try:
             # Get the account ID and set up a separate logger for this profile
             logger = setup_logging(profile)
-            logger.info(f"Started processing for profile: {profile}")
+            logger.info("Started processing for profile: %s", profile)
 
-            # Apply retention policy for all regions for the given profile
-            for region in regions:
-                logger.info(f"Processing log groups in region {region}...")
-                set_retention_for_log_groups(region, profile, logger)
+            # Apply retention policy for all regions for the given profile; regions are independent,
+            # so process them concurrently
+            with ThreadPoolExecutor(max_workers=len(regions)) as executor:
+                list(executor.map(
+                    lambda region: set_retention_for_log_groups(region, profile, logger),
+                    regions
+                ))
 
-            logger.info(f"Retention policy update complete for profile: {profile}")
+            logger.info("Retention policy update complete for profile: %s", profile)
 
         except Exception as e:
-            logger.error(f"Error processing log groups for profile {profile}: {e}")
-            logger.error("Traceback: " + traceback.format_exc())  # Log the full traceback
+            logger.error("Error processing log groups for profile %s: %s", profile, e)
+            logger.error("Traceback: %s", traceback.format_exc())  # Log the full traceback
 
 # Run the processing function
 process_log_groups()